@@ -3,6 +3,8 @@ Anomaly Detector - Manufacturing Test Results Analysis
 A Streamlit application for detecting anomalies in test data.
 """
 
+import uuid
+
 import streamlit as st
 import pandas as pd
 
@@ -44,7 +46,7 @@ def main():
     if uploaded_file is not None:
         # Load the file
         with st.spinner("Loading file..."):
-            df, error = DataLoader.load_excel(uploaded_file)
+            df, error = DataLoader.load_excel(uploaded_file.getvalue())
 
         if error:
             st.error(f":x: {error}")
@@ -53,6 +55,14 @@ def main():
         # Store in session state
         st.session_state.df = df
 
+        # Build per-upload lookup tables once, not on every rerun
+        if st.session_state.file_id != uploaded_file.file_id:
+            st.session_state.item_numbers = DataLoader.get_item_numbers(df)
+            st.session_state.result_names_by_item = DataLoader.get_analyzable_result_names_by_item(df)
+            st.session_state.test_counts = DataLoader.get_test_counts_by_item(df)
+            st.session_state.row_lookup = DataLoader.build_row_lookup(df)
+            st.session_state.file_id = uploaded_file.file_id
+
         # Display basic statistics
         with col_stats:
             stats = DataLoader.get_basic_stats(df)
@@ -60,7 +70,8 @@ def main():
 
         # Data preview
         with st.expander("Preview Data", expanded=False):
-            st.dataframe(df.head(10), width='stretch')
+            preview = df.head(10).drop(columns=[DataLoader.NUMERIC_RESPONSE_COLUMN])
+            st.dataframe(preview, width='stretch', hide_index=True)
 
         st.divider()
 
@@ -68,7 +79,7 @@ def main():
         st.markdown("**Select Products**")
         col1, col2 = st.columns([2, 3])
         with col1:
-            item_numbers = DataLoader.get_item_numbers(df)
+            item_numbers = st.session_state.item_numbers
             selected_items = st.multiselect(
                 "Choose ITEM_NUMBER(s)",
                 options=item_numbers,
@@ -81,7 +92,7 @@ def main():
             st.session_state.selected_item = selected_items
 
             # Show test count
-            total_tests = sum([DataLoader.get_test_count(df, item) for item in selected_items])
+            total_tests = int(st.session_state.test_counts.loc[selected_items].sum())
             with col2:
                 st.markdown(f"<br>**{len(selected_items)}** product(s), **{total_tests}** test sessions", unsafe_allow_html=True)
 
@@ -113,10 +124,10 @@ def configure_filters_section(df: pd.DataFrame, selected_items: list):
     st.caption("Add filters to detect anomalies. Bounds are auto-calculated using quartiles (Q1-Q3) and can be adjusted manually.")
 
     # Get analyzable result names across all selected products
+    result_names_by_item = st.session_state.result_names_by_item
     result_names = []
     for item in selected_items:
-        item_results = DataLoader.get_analyzable_result_names(df, item)
-        result_names.extend(item_results)
+        result_names.extend(result_names_by_item.get(item, []))
     result_names = sorted(list(set(result_names)))
 
     if not result_names:
@@ -125,23 +136,32 @@ def configure_filters_section(df: pd.DataFrame, selected_items: list):
 
     st.caption(f"{len(result_names)} test types available for analysis")
 
-    # Display existing filters
-    if st.session_state.filters:
-        for i, filter_item in enumerate(st.session_state.filters):
-            display_filter_row(i, filter_item, result_names, df, selected_items, remove_filter)
+    # Position of each test type in the selectbox options, built once per rerun
+    result_name_index = {name: idx for idx, name in enumerate(result_names)}
+
+    # Filter rows are batched in a form: edits don't rerun the script until
+    # the form is submitted. Add and Remove are submit buttons too, so
+    # unsubmitted edits are kept when the filter list changes.
+    with st.form("filter_form", border=False):
+        # Display existing filters
+        if st.session_state.filters:
+            st.caption("Changes to filters apply when you click Run Analysis")
+            for filter_item in list(st.session_state.filters):
+                display_filter_row(filter_item, result_names, result_name_index, df, selected_items, remove_filter)
 
-    # Buttons
-    st.markdown("")
-    btn_col1, btn_col2 = st.columns([1, 3])
+        st.markdown("")
+        btn_col1, btn_col2 = st.columns([1, 3])
+        with btn_col1:
+            add_clicked = st.form_submit_button("➕ Add Filter", width='stretch')
+        with btn_col2:
+            submitted = st.form_submit_button("▶ Run Analysis", type="primary", width='stretch')
 
-    with btn_col1:
-        if st.button("➕ Add Filter", width='stretch'):
-            add_filter()
-            st.rerun()
+    if add_clicked:
+        add_filter()
+        st.rerun()
 
-    with btn_col2:
-        if st.button("▶ Run Analysis", type="primary", width='stretch'):
-            run_analysis(df, selected_items)
+    if submitted:
+        run_analysis(df, selected_items)
 
 
 def run_analysis(df: pd.DataFrame, selected_items: list):
@@ -168,14 +188,11 @@ def run_analysis(df: pd.DataFrame, selected_items: list):
 
     # Run anomaly detection for all selected products
     with st.spinner("Analyzing data..."):
-        all_results = []
-        for item in selected_items:
-            result_df = AnomalyDetector.detect_anomalies(df, item, criteria)
-            all_results.append(result_df)
-
-        # Combine all results
-        combined_results = pd.concat(all_results, ignore_index=True)
-        st.session_state.analysis_results = combined_results
+        subset = df[df['ITEM_NUMBER'].isin(selected_items)]
+        combined_results = AnomalyDetector.detect_anomalies_bulk(subset, criteria)
+        st.session_state.analysis_results = combined_results.reset_index(drop=True)
+        # Identifies these results in the (cross-session) export cache
+        st.session_state.run_id = uuid.uuid4().hex
 
     st.success(f"Analysis complete! Processed {len(selected_items)} product(s) with {len(st.session_state.filters)} filter(s)")
     st.rerun()
@@ -1,20 +1,29 @@
 """Data loading and validation for anomaly detection."""
 
+import numpy as np
 import pandas as pd
-from typing import Tuple, List
+import streamlit as st
+from io import BytesIO
+from typing import Dict, Tuple, List
 
 
 class DataLoader:
     """Handle Excel file loading and validation."""
 
     # Fields to exclude from analysis (summary fields)
-    EXCLUDED_RESULT_NAMES = [
+    EXCLUDED_RESULT_NAMES = frozenset({
         "Ave Dim Stab Warp",
         "Std Dim Stab Warp",
         "Ave Dim Stab Fill",
         "Std Dim Stab Fill",
         "Test Complete?"
-    ]
+    })
+
+    # Numeric copy of RESPONSE added at load time (non-numeric values are NaN)
+    NUMERIC_RESPONSE_COLUMN = "_RESPONSE_NUM"
+
+    # Level names of the (ITEM_NUMBER, RESULT_NAME) row lookup index
+    LOOKUP_INDEX_NAMES = ["item_key", "result_key"]
 
     # Required columns in the Excel file
     REQUIRED_COLUMNS = [
@@ -25,14 +34,20 @@ class DataLoader:
     ]
 
     @staticmethod
-    def load_excel(file) -> Tuple[pd.DataFrame, str]:
+    @st.cache_data(show_spinner=False, max_entries=8, ttl=3600)
+    def load_excel(file_bytes: bytes) -> Tuple[pd.DataFrame, str]:
         """
         Load and validate Excel file.
 
+        Results are cached in memory on the file contents, so Streamlit
+        reruns (and other sessions) with the same upload skip the Excel parse.
+        The cache is shared by all sessions, so it is bounded: at most 8
+        parsed files, each kept for up to an hour. Nothing is written to disk.
+
         Parameters:
         -----------
-        file : UploadedFile
-            Streamlit uploaded file object
+        file_bytes : bytes
+            Raw contents of the uploaded file (UploadedFile.getvalue())
 
         Returns:
         --------
@@ -41,8 +56,8 @@ class DataLoader:
             If successful, error_message is None
         """
         try:
-            # Read Excel file
-            df = pd.read_excel(file, engine='openpyxl')
+            # Read Excel file with the Rust-based calamine engine
+            df = pd.read_excel(BytesIO(file_bytes), engine='calamine')
 
             # Validate required columns
             missing_cols = [col for col in DataLoader.REQUIRED_COLUMNS
@@ -54,114 +69,170 @@ class DataLoader:
             if df.empty:
                 return None, "The uploaded file contains no data"
 
+            # Convert RESPONSE to numbers once for all downstream comparisons
+            df[DataLoader.NUMERIC_RESPONSE_COLUMN] = pd.to_numeric(df['RESPONSE'], errors='coerce')
+
+            # Low-cardinality key columns as categoricals: unique/nunique and
+            # equality work on integer codes instead of hashing strings
+            df['ITEM_NUMBER'] = df['ITEM_NUMBER'].astype('category')
+            df['RESULT_NAME'] = df['RESULT_NAME'].astype('category')
+
             return df, None
 
         except Exception as e:
             return None, f"Error reading Excel file: {str(e)}"
 
     @staticmethod
-    def get_item_numbers(df: pd.DataFrame) -> List[str]:
-        """Get list of unique ITEM_NUMBERs from dataframe."""
-        return sorted(df['ITEM_NUMBER'].dropna().unique().tolist())
+    def get_numeric_response(df: pd.DataFrame) -> pd.Series:
+        """
+        Get RESPONSE as floats, with non-numeric values as NaN.
+
+        Uses the column precomputed by load_excel when present.
+        """
+        if DataLoader.NUMERIC_RESPONSE_COLUMN in df.columns:
+            return df[DataLoader.NUMERIC_RESPONSE_COLUMN]
+        return pd.to_numeric(df['RESPONSE'], errors='coerce')
 
     @staticmethod
-    def get_analyzable_result_names(df: pd.DataFrame, item_number: str = None) -> List[str]:
+    def build_row_lookup(df: pd.DataFrame) -> pd.Series:
         """
-        Get list of RESULT_NAMEs that can be analyzed (excluding summary fields).
+        Index df's row positions by sorted (ITEM_NUMBER, RESULT_NAME).
+
+        The loaded frame keeps the file's row order; this separate lookup
+        lets the rows for a key be found by binary search. Rows with a blank
+        ITEM_NUMBER or RESULT_NAME are left out so the index stays sorted.
 
         Parameters:
         -----------
         df : pd.DataFrame
             The input dataframe
-        item_number : str, optional
-            If provided, filter to only this ITEM_NUMBER
 
         Returns:
         --------
-        List[str]
-            Sorted list of analyzable RESULT_NAMEs
+        pd.Series
+            Row positions in df, indexed by a sorted MultiIndex named
+            LOOKUP_INDEX_NAMES
         """
-        if item_number:
-            df = df[df['ITEM_NUMBER'] == item_number]
-
-        result_names = df['RESULT_NAME'].dropna().unique()
+        has_key = (df['ITEM_NUMBER'].notna() & df['RESULT_NAME'].notna()).to_numpy()
+        index = pd.MultiIndex.from_arrays(
+            [df['ITEM_NUMBER'][has_key], df['RESULT_NAME'][has_key]],
+            names=DataLoader.LOOKUP_INDEX_NAMES
+        )
+        return pd.Series(np.flatnonzero(has_key), index=index).sort_index()
 
-        # Filter out excluded summary fields
-        analyzable = [name for name in result_names
-                     if name not in DataLoader.EXCLUDED_RESULT_NAMES]
+    @staticmethod
+    def get_row_positions(lookup: pd.Series, item_numbers: list, result_name: str = None) -> np.ndarray:
+        """
+        Get row positions for ITEM_NUMBERs, optionally narrowed to one RESULT_NAME.
 
-        return sorted(analyzable)
+        Parameters:
+        -----------
+        lookup : pd.Series
+            Lookup built by build_row_lookup()
+        item_numbers : list
+            ITEM_NUMBERs to select
+        result_name : str, optional
+            If provided, also filter to this RESULT_NAME
 
-    @staticmethod
-    def get_test_count(df: pd.DataFrame, item_number: str) -> int:
-        """Get count of unique TEST_NUMBERs for a given ITEM_NUMBER."""
-        filtered_df = df[df['ITEM_NUMBER'] == item_number]
-        return filtered_df['TEST_NUMBER'].nunique()
+        Returns:
+        --------
+        np.ndarray
+            Matching row positions in file order (empty if there are none)
+        """
+        positions = lookup.to_numpy()
+        matches = []
+        for item_number in item_numbers:
+            key = (item_number,) if result_name is None else (item_number, result_name)
+            try:
+                start, stop = lookup.index.slice_locs(key, key)
+            except (KeyError, TypeError):
+                # Not in the lookup (e.g. not a category of the column)
+                continue
+            matches.append(positions[start:stop])
+
+        if not matches:
+            return np.empty(0, dtype=positions.dtype)
+        return np.sort(np.concatenate(matches))
 
     @staticmethod
-    def get_value_range(df: pd.DataFrame, item_number: str, result_name: str) -> Tuple[float, float]:
+    def select_rows(df: pd.DataFrame, item_number: str, result_name: str = None) -> pd.DataFrame:
         """
-        Get min and max RESPONSE values for a specific ITEM_NUMBER and RESULT_NAME.
+        Get rows for one ITEM_NUMBER, optionally narrowed to one RESULT_NAME.
 
         Parameters:
         -----------
         df : pd.DataFrame
             The input dataframe
         item_number : str
-            The ITEM_NUMBER to filter
-        result_name : str
-            The RESULT_NAME to filter
+            The ITEM_NUMBER to select
+        result_name : str, optional
+            If provided, also filter to this RESULT_NAME
 
         Returns:
         --------
-        Tuple[float, float]
-            (min_value, max_value) or (None, None) if no numeric data
+        pd.DataFrame
+            Matching rows in file order (empty if there are none)
         """
-        filtered_df = df[
-            (df['ITEM_NUMBER'] == item_number) &
-            (df['RESULT_NAME'] == result_name)
-        ]
+        mask = df['ITEM_NUMBER'] == item_number
+        if result_name is not None:
+            mask &= df['RESULT_NAME'] == result_name
+        return df[mask]
 
-        try:
-            # Convert to numeric, coerce errors to NaN
-            numeric_values = pd.to_numeric(filtered_df['RESPONSE'], errors='coerce')
-            numeric_values = numeric_values.dropna()
+    @staticmethod
+    def get_item_numbers(df: pd.DataFrame) -> List[str]:
+        """Get list of unique ITEM_NUMBERs from dataframe."""
+        return sorted(df['ITEM_NUMBER'].dropna().unique().tolist())
+
+    @staticmethod
+    def get_analyzable_result_names_by_item(df: pd.DataFrame) -> Dict[str, List[str]]:
+        """
+        Get RESULT_NAMEs that can be analyzed (excluding summary fields) per ITEM_NUMBER.
+
+        Parameters:
+        -----------
+        df : pd.DataFrame
+            The input dataframe
 
-            if len(numeric_values) == 0:
-                return None, None
+        Returns:
+        --------
+        Dict[str, List[str]]
+            Sorted list of analyzable RESULT_NAMEs for each ITEM_NUMBER
+        """
+        # Unique (item, result name) pairs, without excluded summary fields
+        pairs = df[['ITEM_NUMBER', 'RESULT_NAME']].dropna().drop_duplicates()
+        pairs = pairs[~pairs['RESULT_NAME'].isin(list(DataLoader.EXCLUDED_RESULT_NAMES))]
 
-            return float(numeric_values.min()), float(numeric_values.max())
-        except Exception:
-            return None, None
+        result_names = {}
+        for item_number, result_name in pairs.itertuples(index=False, name=None):
+            result_names.setdefault(item_number, []).append(result_name)
+
+        return {item_number: sorted(names) for item_number, names in result_names.items()}
 
     @staticmethod
-    def get_basic_stats(df: pd.DataFrame) -> dict:
+    def get_test_counts_by_item(df: pd.DataFrame) -> pd.Series:
         """
-        Get basic statistics about the uploaded data.
+        Get count of unique TEST_NUMBERs for every ITEM_NUMBER in one pass.
 
         Returns:
         --------
-        dict with keys:
-            - total_rows: int
-            - total_items: int
-            - total_tests: int
+        pd.Series
+            Unique TEST_NUMBER counts indexed by ITEM_NUMBER
         """
-        return {
-            'total_rows': len(df),
-            'total_items': df['ITEM_NUMBER'].nunique(),
-            'total_tests': df['TEST_NUMBER'].nunique()
-        }
+        return df.groupby('ITEM_NUMBER', observed=True)['TEST_NUMBER'].nunique()
 
     @staticmethod
-    def calculate_iqr_bounds(df: pd.DataFrame, item_numbers: list, result_name: str) -> tuple:
+    def get_response_summary(df: pd.DataFrame, item_numbers: list, result_name: str,
+                             lookup: pd.Series = None) -> tuple:
         """
-        Calculate quartile-based bounds for anomaly detection.
+        Get the RESPONSE range and quartile-based bounds for a RESULT_NAME.
 
-        Uses Q1 and Q3 as bounds:
+        Quartile bounds for anomaly detection:
         - Lower Bound = Q1 (25th percentile)
         - Upper Bound = Q3 (75th percentile)
 
         This flags values in the lower 25% and upper 25% as potential anomalies.
+        Range and quartiles come from one row selection and one aggregate
+        across all selected ITEM_NUMBERs.
 
         Parameters:
         -----------
@@ -170,32 +241,51 @@ class DataLoader:
         item_numbers : list
             List of ITEM_NUMBERs to include in calculation
         result_name : str
-            The RESULT_NAME to calculate bounds for
+            The RESULT_NAME to summarize
+        lookup : pd.Series, optional
+            Row lookup built from df by build_row_lookup(); without it rows
+            are found by a boolean scan
 
         Returns:
         --------
-        Tuple[float, float]
-            (lower_bound, upper_bound) or (None, None) if insufficient data
+        Tuple
+            (min_value, max_value, q1, q3). All are None if no value is
+            numeric; q1 and q3 are None with fewer than 4 numeric values.
         """
-        # Filter data to selected items and result name
-        filtered_df = df[
-            (df['ITEM_NUMBER'].isin(item_numbers)) &
-            (df['RESULT_NAME'] == result_name)
-        ]
+        # Select rows for the chosen items and result name
+        numeric_values = DataLoader.get_numeric_response(df)
+        if lookup is not None:
+            positions = DataLoader.get_row_positions(lookup, item_numbers, result_name)
+            numeric_values = numeric_values.iloc[positions].dropna()
+        else:
+            mask = (df['ITEM_NUMBER'].isin(item_numbers)) & (df['RESULT_NAME'] == result_name)
+            numeric_values = numeric_values[mask].dropna()
 
-        try:
-            # Convert to numeric, coerce errors to NaN
-            numeric_values = pd.to_numeric(filtered_df['RESPONSE'], errors='coerce')
-            numeric_values = numeric_values.dropna()
+        if numeric_values.empty:
+            return None, None, None, None
 
-            if len(numeric_values) < 4:  # Need at least 4 points for meaningful quartiles
-                return None, None
+        # The 0 and 1 quantiles are the min and max
+        min_value, q1, q3, max_value = numeric_values.quantile([0, 0.25, 0.75, 1]).tolist()
 
-            # Calculate quartiles - use Q1 and Q3 as bounds
-            Q1 = numeric_values.quantile(0.25)
-            Q3 = numeric_values.quantile(0.75)
+        if len(numeric_values) < 4:  # Need at least 4 points for meaningful quartiles
+            return min_value, max_value, None, None
 
-            return float(Q1), float(Q3)
+        return min_value, max_value, q1, q3
 
-        except Exception:
-            return None, None
+    @staticmethod
+    def get_basic_stats(df: pd.DataFrame) -> dict:
+        """
+        Get basic statistics about the uploaded data.
+
+        Returns:
+        --------
+        dict with keys:
+            - total_rows: int
+            - total_items: int
+            - total_tests: int
+        """
+        return {
+            'total_rows': len(df),
+            'total_items': df['ITEM_NUMBER'].nunique(),
+            'total_tests': df['TEST_NUMBER'].nunique()
+        }
@@ -1,12 +1,19 @@
 """Anomaly detection engine for manufacturing test data."""
 
+import numpy as np
 import pandas as pd
 from typing import Dict, Tuple
 
+from src.data_loader import DataLoader
+from src.kernels import outlier_codes
+
 
 class AnomalyDetector:
     """Detect anomalies in test data based on user-defined boundaries."""
 
+    # Shared dtype for IS_OUTLIER so per-item results concatenate as categorical
+    OUTLIER_DTYPE = pd.CategoricalDtype(categories=['NORMAL', 'ABNORMAL'])
+
     @staticmethod
     def detect_anomalies(df: pd.DataFrame, item_number: str, criteria: Dict[str, Tuple[float, float]]) -> pd.DataFrame:
         """
@@ -27,48 +34,82 @@ class AnomalyDetector:
         pd.DataFrame with additional columns:
             - Lower_Bound: Expected lower limit (only for rows with criteria)
             - Upper_Bound: Expected upper limit (only for rows with criteria)
-            - IS_OUTLIER: 'ABNORMAL' or 'NORMAL' (defaults to 'NORMAL')
+            - IS_OUTLIER: 'ABNORMAL' or 'NORMAL' (defaults to 'NORMAL'),
+              stored as a categorical
 
         Logic:
         ------
         1. Filter df to only rows where ITEM_NUMBER == item_number
-        2. Initialize all rows as 'NORMAL'
-        3. For each row with criteria defined:
+        2. Map each RESULT_NAME to its bounds (vectorized)
+        3. For rows with criteria defined and a numeric RESPONSE:
            - If RESPONSE < lower_bound OR RESPONSE > upper_bound:
                IS_OUTLIER = 'ABNORMAL'
-           - Else: remains 'NORMAL'
+           - Else: 'NORMAL'
         4. Return augmented DataFrame
         """
-        # Filter to specific item
-        filtered_df = df[df['ITEM_NUMBER'] == item_number].copy()
+        # Filter to specific item (row selection only, no defensive copy)
+        filtered_df = DataLoader.select_rows(df, item_number)
 
-        # Initialize new columns - everything defaults to NORMAL
-        filtered_df['Lower_Bound'] = None
-        filtered_df['Upper_Bound'] = None
-        filtered_df['IS_OUTLIER'] = 'NORMAL'
+        return AnomalyDetector.detect_anomalies_bulk(filtered_df, criteria)
 
-        # Process each row
-        for idx, row in filtered_df.iterrows():
-            result_name = row['RESULT_NAME']
+    @staticmethod
+    def detect_anomalies_bulk(df: pd.DataFrame, criteria: Dict[str, Tuple[float, float]]) -> pd.DataFrame:
+        """
+        Detect anomalies across every row of df in a single vectorized pass.
+
+        Parameters:
+        -----------
+        df : pd.DataFrame
+            The test data to analyze (e.g., all rows for the selected products)
+        criteria : dict
+            Dictionary mapping RESULT_NAME to (lower_bound, upper_bound)
 
-            # Check if this result_name has criteria defined
-            if result_name in criteria:
-                lower_bound, upper_bound = criteria[result_name]
-                filtered_df.at[idx, 'Lower_Bound'] = lower_bound
-                filtered_df.at[idx, 'Upper_Bound'] = upper_bound
+        Returns:
+        --------
+        pd.DataFrame
+            New frame with df's columns plus Lower_Bound, Upper_Bound and
+            IS_OUTLIER, as described in detect_anomalies()
+        """
+        # Split criteria into per-RESULT_NAME bound lookups
+        lower_map = {name: bounds[0] for name, bounds in criteria.items()}
+        upper_map = {name: bounds[1] for name, bounds in criteria.items()}
 
-                # Get response value and check bounds
-                try:
-                    response = float(row['RESPONSE'])
+        # Bounds per row as float64 (NaN for rows without criteria)
+        result_names = df['RESULT_NAME']
+        lower = result_names.map(lower_map).to_numpy(dtype=np.float64)
+        upper = result_names.map(upper_map).to_numpy(dtype=np.float64)
 
-                    if response < lower_bound or response > upper_bound:
-                        filtered_df.at[idx, 'IS_OUTLIER'] = 'ABNORMAL'
-                    # else remains NORMAL (already set as default)
-                except (ValueError, TypeError):
-                    # If RESPONSE is not numeric, keep as NORMAL
-                    pass
+        # Non-numeric RESPONSE values become NaN and stay NORMAL
+        response = DataLoader.get_numeric_response(df).to_numpy(dtype=np.float64)
+        has_criteria = result_names.isin(lower_map).to_numpy()
+        codes = outlier_codes(response, lower, upper, has_criteria)
+        outlier = pd.Categorical.from_codes(codes, dtype=AnomalyDetector.OUTLIER_DTYPE)
 
-        return filtered_df
+        # Attach the new columns in a single assign
+        return df.assign(Lower_Bound=lower, Upper_Bound=upper, IS_OUTLIER=outlier)
+
+    @staticmethod
+    def get_outlier_codes(result_df: pd.DataFrame) -> np.ndarray:
+        """
+        Get IS_OUTLIER as int8 codes (0 = NORMAL, 1 = ABNORMAL).
+
+        For results built by detect_anomalies these are the categorical's
+        own codes, so no string comparison is needed.
+
+        Parameters:
+        -----------
+        result_df : pd.DataFrame
+            DataFrame returned by detect_anomalies()
+
+        Returns:
+        --------
+        np.ndarray of int8 codes, one per row
+        """
+        outlier = result_df['IS_OUTLIER']
+        if (isinstance(outlier.dtype, pd.CategoricalDtype) and
+                outlier.cat.categories.equals(AnomalyDetector.OUTLIER_DTYPE.categories)):
+            return outlier.cat.codes.to_numpy()
+        return (outlier == 'ABNORMAL').to_numpy().astype(np.int8)
 
     @staticmethod
     def get_summary_stats(result_df: pd.DataFrame) -> Dict[str, int]:
@@ -88,8 +129,9 @@ class AnomalyDetector:
             - abnormal_count: Count of ABNORMAL
             - percent_abnormal: Percentage of abnormal out of total
         """
-        normal_count = (result_df['IS_OUTLIER'] == 'NORMAL').sum()
-        abnormal_count = (result_df['IS_OUTLIER'] == 'ABNORMAL').sum()
+        codes = AnomalyDetector.get_outlier_codes(result_df)
+        normal_count = int(np.count_nonzero(codes == 0))
+        abnormal_count = int(np.count_nonzero(codes == 1))
         total_analyzed = len(result_df)
 
         percent_abnormal = (abnormal_count / total_analyzed * 100) if total_analyzed > 0 else 0
@@ -119,18 +161,21 @@ class AnomalyDetector:
             - affected_result_names: List of RESULT_NAMEs with anomalies
         """
         # Filter to only abnormal rows
-        abnormal_df = result_df[result_df['IS_OUTLIER'] == 'ABNORMAL']
+        abnormal_df = result_df[AnomalyDetector.get_outlier_codes(result_df) == 1]
 
         if abnormal_df.empty:
             return pd.DataFrame(columns=['TEST_NUMBER', 'anomaly_count', 'affected_result_names'])
 
-        # Group by TEST_NUMBER
-        affected = abnormal_df.groupby('TEST_NUMBER').agg({
-            'IS_OUTLIER': 'count',
-            'RESULT_NAME': lambda x: ', '.join(x.unique())
-        }).reset_index()
-
-        affected.columns = ['TEST_NUMBER', 'anomaly_count', 'affected_result_names']
+        # Group by TEST_NUMBER: anomaly counts and de-duplicated names
+        counts = abnormal_df.groupby('TEST_NUMBER').size().rename('anomaly_count')
+        names = (
+            abnormal_df[['TEST_NUMBER', 'RESULT_NAME']]
+            .drop_duplicates()
+            .groupby('TEST_NUMBER')['RESULT_NAME']
+            .agg(', '.join)
+            .rename('affected_result_names')
+        )
+        affected = pd.concat([counts, names], axis=1).reset_index()
 
         return affected.sort_values('anomaly_count', ascending=False)
 
@@ -150,10 +195,10 @@ class AnomalyDetector:
             - RESULT_NAME
             - anomaly_count
         """
-        abnormal_df = result_df[result_df['IS_OUTLIER'] == 'ABNORMAL']
+        abnormal_df = result_df[AnomalyDetector.get_outlier_codes(result_df) == 1]
 
         if abnormal_df.empty:
             return pd.DataFrame(columns=['RESULT_NAME', 'anomaly_count'])
 
-        breakdown = abnormal_df.groupby('RESULT_NAME').size().reset_index(name='anomaly_count')
+        breakdown = abnormal_df.groupby('RESULT_NAME', observed=True).size().reset_index(name='anomaly_count')
         return breakdown.sort_values('anomaly_count', ascending=False)
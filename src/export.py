@@ -1,55 +1,304 @@
-"""Excel export functionality with conditional formatting."""
+"""Result export: Excel with abnormal rows highlighted, and Parquet."""
 
+import numpy as np
 import pandas as pd
+import streamlit as st
 from io import BytesIO
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
 
+from src.data_loader import DataLoader
+from src.detector import AnomalyDetector
+from src.fast_xlsx import write_highlighted
 
-def create_formatted_excel(df: pd.DataFrame) -> BytesIO:
+# xlsxwriter is an optional extra (pip install .[xlsx])
+try:
+    import xlsxwriter
+    HAS_XLSXWRITER = True
+except ImportError:
+    HAS_XLSXWRITER = False
+
+# Rows converted for xlsxwriter at a time, bounding the temporary copies
+EXCEL_CHUNK_ROWS = 10_000
+
+# Write Excel files with the direct XML writer (src.fast_xlsx). Measured from
+# 100 to 100k rows it was about 3x faster than xlsxwriter and 4-7x faster
+# than openpyxl at every size, so it is used for all exports.
+# Set to False to fall back to xlsxwriter (or openpyxl without it).
+USE_FAST_XLSX = True
+
+# Light red fill for abnormal rows (ARGB, fully opaque)
+_RED_FILL = PatternFill(start_color='FFFFCCCC', end_color='FFFFCCCC', fill_type='solid')
+
+_THIN_SIDE = Side(style='thin')
+
+# Names of the openpyxl named styles built by _openpyxl_named_styles()
+HEADER_STYLE_NAME = 'results_header'
+ABNORMAL_STYLE_NAME = 'abnormal'
+ABNORMAL_DATE_STYLE_NAME = 'abnormal_date'
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def create_formatted_excel(_df: pd.DataFrame, cache_key) -> bytes:
     """
-    Create an Excel file with conditional formatting for abnormal rows.
+    Create an Excel file with abnormal rows highlighted.
+
+    Written by src.fast_xlsx. With USE_FAST_XLSX off, uses xlsxwriter in
+    constant_memory mode when installed, or streams rows through a
+    write-only openpyxl workbook.
+
+    Cached, so Streamlit reruns don't rebuild the file. The leading
+    underscore keeps _df out of the cache key (Streamlit only samples the
+    rows of large frames when hashing, so edits could be missed);
+    cache_key must identify the data instead.
 
     Parameters:
     -----------
-    df : pd.DataFrame
+    _df : pd.DataFrame
         The results dataframe with IS_OUTLIER column
+    cache_key : hashable
+        Unique for each distinct _df, e.g. (run_id, 'all')
 
     Returns:
     --------
-    BytesIO object containing the formatted Excel file
+    bytes of the formatted Excel file
     """
-    # Create a BytesIO buffer
+    df = _drop_internal_columns(_df)
+    return _write_excel(df, _abnormal_mask(df))
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def create_plain_excel(_df: pd.DataFrame, cache_key) -> bytes:
+    """
+    Create an Excel file without highlighting, e.g. for abnormal rows only.
+
+    Written like create_formatted_excel() and cached the same way.
+
+    Parameters:
+    -----------
+    _df : pd.DataFrame
+        The rows to export
+    cache_key : hashable
+        Unique for each distinct _df, e.g. (run_id, 'abnormal')
+
+    Returns:
+    --------
+    bytes of the Excel file
+    """
+    df = _drop_internal_columns(_df)
+    return _write_excel(df, np.zeros(len(df), dtype=bool))
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def create_parquet(_df: pd.DataFrame, cache_key) -> bytes:
+    """
+    Create a Parquet file of the results.
+
+    Much faster to write than xlsx for large result sets, and keeps
+    column dtypes (categoricals, floats) intact. RESPONSE is stored as
+    text, with its numeric value alongside in RESPONSE_NUMERIC. Cached
+    like create_formatted_excel().
+
+    Parameters:
+    -----------
+    _df : pd.DataFrame
+        The results dataframe
+    cache_key : hashable
+        Unique for each distinct _df, e.g. (run_id, 'all')
+
+    Returns:
+    --------
+    bytes of the Parquet file
+    """
+    df = _drop_internal_columns(_df)
+
+    # Parquet columns need a single type; RESPONSE mixes numbers and text
+    object_cols = df.select_dtypes(include='object').columns
+    df = df.astype({col: 'string' for col in object_cols})
+
+    # Keep the numbers as numbers (NaN for text responses)
+    if 'RESPONSE' in df.columns:
+        df.insert(df.columns.get_loc('RESPONSE') + 1, 'RESPONSE_NUMERIC', DataLoader.get_numeric_response(_df))
+
     output = BytesIO()
+    df.to_parquet(output, engine='pyarrow', compression='zstd', index=False)
+    return output.getvalue()
 
-    # Write dataframe to Excel
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Results')
 
-    # Load the workbook to apply formatting
-    output.seek(0)
-    workbook = load_workbook(output)
-    worksheet = workbook['Results']
+def _drop_internal_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Leave out helper columns added at load time."""
+    return df.drop(columns=[DataLoader.NUMERIC_RESPONSE_COLUMN], errors='ignore')
 
-    # Define light red fill for abnormal rows
-    red_fill = PatternFill(start_color='FFCCCC', end_color='FFCCCC', fill_type='solid')
 
-    # Find the IS_OUTLIER column index
-    header_row = list(worksheet.iter_rows(min_row=1, max_row=1, values_only=True))[0]
-    is_outlier_col_idx = header_row.index('IS_OUTLIER') + 1 if 'IS_OUTLIER' in header_row else None
+def _abnormal_mask(df: pd.DataFrame) -> np.ndarray:
+    """Boolean array, True for rows with IS_OUTLIER == 'ABNORMAL'."""
+    if 'IS_OUTLIER' in df.columns:
+        return AnomalyDetector.get_outlier_codes(df) == 1
+    return np.zeros(len(df), dtype=bool)
 
-    if is_outlier_col_idx:
-        # Iterate through rows and apply formatting
-        for row_idx, row in enumerate(worksheet.iter_rows(min_row=2, max_row=worksheet.max_row), start=2):
-            # Check if IS_OUTLIER is ABNORMAL
-            if row[is_outlier_col_idx - 1].value == 'ABNORMAL':
-                # Apply red fill to all cells in the row
-                for cell in row:
-                    cell.fill = red_fill
 
-    # Save to buffer
+def _write_excel(df: pd.DataFrame, highlight_mask: np.ndarray) -> bytes:
+    """Write df with the configured writer, filling highlight_mask rows."""
     output = BytesIO()
+
+    if USE_FAST_XLSX:
+        write_highlighted(df, output, highlight_mask)
+    elif HAS_XLSXWRITER:
+        _write_xlsxwriter(df, output, highlight_mask)
+    else:
+        _write_openpyxl(df, output, highlight_mask)
+
+    return output.getvalue()
+
+
+def _excel_rows(df: pd.DataFrame):
+    """
+    Yield df's rows as tuples that xlsxwriter and openpyxl can write.
+
+    Missing values (NaN/NaT) become None, i.e. blank cells, as with
+    to_excel(). Infinite values become the text 'inf'/'-inf', as
+    src.fast_xlsx writes them. Rows are converted EXCEL_CHUNK_ROWS at a time.
+    """
+    # Only float and mixed (object) columns can hold infinities
+    inf_cols = [
+        col for col in df.columns
+        if pd.api.types.is_float_dtype(df[col]) or pd.api.types.is_object_dtype(df[col])
+    ]
+
+    for start in range(0, len(df), EXCEL_CHUNK_ROWS):
+        chunk = df.iloc[start:start + EXCEL_CHUNK_ROWS].astype(object)
+        chunk = chunk.where(chunk.notna(), None)
+        for col in inf_cols:
+            is_inf = chunk[col].isin([np.inf, -np.inf])
+            if is_inf.any():
+                chunk.loc[is_inf, col] = chunk.loc[is_inf, col].map(str)
+        yield from chunk.itertuples(index=False, name=None)
+
+
+def _write_xlsxwriter(df: pd.DataFrame, output: BytesIO, highlight_mask: np.ndarray):
+    """
+    Write df row by row in xlsxwriter's constant_memory mode.
+
+    constant_memory flushes each row once the next one starts, keeping
+    memory flat, but rows must be written in order. to_excel() writes
+    column by column, so rows are written here directly, with the fill
+    for highlight_mask rows decided up front.
+    """
+    # Text from the upload is written as plain strings, never turned into
+    # formulas or hyperlinks, as in the other writers
+    workbook = xlsxwriter.Workbook(output, {
+        'constant_memory': True,
+        'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+        'strings_to_formulas': False,
+        'strings_to_urls': False
+    })
+    worksheet = workbook.add_worksheet('Results')
+
+    # Same header style as the openpyxl header named style
+    header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+    worksheet.write_row(0, 0, list(df.columns), header_format)
+
+    # Define light red fill for abnormal rows (and for their date cells)
+    red_format = workbook.add_format({'bg_color': '#FFCCCC'})
+    red_date_format = workbook.add_format({'bg_color': '#FFCCCC', 'num_format': 'yyyy-mm-dd hh:mm:ss'})
+    date_cols = [
+        col_idx for col_idx, col in enumerate(df.columns)
+        if pd.api.types.is_datetime64_any_dtype(df[col])
+    ]
+
+    rows = _excel_rows(df)
+    for row_num, (is_abnormal, row) in enumerate(zip(highlight_mask.tolist(), rows), start=1):
+        if is_abnormal:
+            worksheet.write_row(row_num, 0, row, red_format)
+            # Dates need a number format as well as the fill
+            for col_idx in date_cols:
+                if row[col_idx] is not None:
+                    worksheet.write_datetime(row_num, col_idx, row[col_idx], red_date_format)
+        else:
+            worksheet.write_row(row_num, 0, row)
+
+    workbook.close()
+
+
+def _write_openpyxl(df: pd.DataFrame, output: BytesIO, highlight_mask: np.ndarray):
+    """
+    Stream df through a write-only openpyxl workbook, filling highlight_mask rows.
+
+    The highlight is applied as each row is written, so no second
+    load/format pass is needed.
+    """
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('Results')
+
+    for style in _openpyxl_named_styles():
+        workbook.add_named_style(style)
+
+    # Header row
+    header = []
+    for col in df.columns:
+        cell = _openpyxl_cell(worksheet, col)
+        cell.style = HEADER_STYLE_NAME
+        header.append(cell)
+    worksheet.append(header)
+
+    # Stream data rows, applying the style while writing. Which rows to
+    # highlight is decided up front (highlight_mask), so the row
+    # loop never inspects cell values. Date columns get the date variant.
+    abnormal_styles = [
+        ABNORMAL_DATE_STYLE_NAME if pd.api.types.is_datetime64_any_dtype(df[col]) else ABNORMAL_STYLE_NAME
+        for col in df.columns
+    ]
+    rows = _excel_rows(df)
+    for is_abnormal, row in zip(highlight_mask.tolist(), rows):
+        if is_abnormal:
+            cells = []
+            for value, style in zip(row, abnormal_styles):
+                cell = _openpyxl_cell(worksheet, value)
+                cell.style = style
+                cells.append(cell)
+            worksheet.append(cells)
+        else:
+            worksheet.append([
+                _openpyxl_cell(worksheet, value) if isinstance(value, str) else value
+                for value in row
+            ])
+
     workbook.save(output)
-    output.seek(0)
 
-    return output
+
+def _openpyxl_named_styles() -> list:
+    """
+    Build the named styles for one openpyxl workbook.
+
+    Adding a NamedStyle binds it to that workbook, so each workbook gets
+    fresh objects. Cells reference the styles by name, so openpyxl resolves
+    each style once instead of deduplicating a fill per cell.
+    """
+    return [
+        # Header: bold, thin border, centered, like pandas' to_excel() header.
+        # src.fast_xlsx and the xlsxwriter header format use the same style.
+        NamedStyle(
+            name=HEADER_STYLE_NAME,
+            font=Font(bold=True),
+            border=Border(left=_THIN_SIDE, right=_THIN_SIDE, top=_THIN_SIDE, bottom=_THIN_SIDE),
+            alignment=Alignment(horizontal='center', vertical='top')
+        ),
+        NamedStyle(name=ABNORMAL_STYLE_NAME, fill=_RED_FILL),
+        # Assigning a named style replaces the cell's number format, so date
+        # cells in abnormal rows need a style that carries the date format too
+        NamedStyle(name=ABNORMAL_DATE_STYLE_NAME, fill=_RED_FILL, number_format='yyyy-mm-dd hh:mm:ss'),
+    ]
+
+
+def _openpyxl_cell(worksheet, value) -> WriteOnlyCell:
+    """
+    Wrap value in a WriteOnlyCell, keeping strings as text.
+
+    openpyxl stores any string starting with '=' as a formula; text from the
+    upload must not become one.
+    """
+    cell = WriteOnlyCell(worksheet, value=value)
+    if isinstance(value, str):
+        cell.data_type = 's'
+    return cell
@@ -0,0 +1,220 @@
+"""Minimal streaming XLSX writer for a single sheet with highlighted rows."""
+
+import math
+import numbers
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+# Rows converted and written at a time
+CHUNK_ROWS = 10_000
+
+# Excel stores dates as days since this epoch (1900 date system)
+EXCEL_EPOCH = pd.Timestamp('1899-12-30')
+
+# Control characters that are not allowed in XML 1.0
+_ILLEGAL_XML_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# cellXfs indexes in styles.xml
+STYLE_NORMAL = 0
+STYLE_HIGHLIGHT = 1
+STYLE_DATE = 2
+STYLE_HIGHLIGHT_DATE = 3
+STYLE_HEADER = 4
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{sheet_name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+# Fills 0 and 1 are required by Excel; fill 2 is the light red highlight.
+# The header uses the bold font 1 and thin border 1.
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd hh:mm:ss"/></numFmts>'
+    '<fonts count="2">'
+    '<font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font>'
+    '</fonts>'
+    '<fills count="3">'
+    '<fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill>'
+    '<fill><patternFill patternType="solid"><fgColor rgb="FFFFCCCC"/><bgColor indexed="64"/></patternFill></fill>'
+    '</fills>'
+    '<borders count="2">'
+    '<border><left/><right/><top/><bottom/><diagonal/></border>'
+    '<border><left style="thin"><color auto="1"/></left><right style="thin"><color auto="1"/></right>'
+    '<top style="thin"><color auto="1"/></top><bottom style="thin"><color auto="1"/></bottom><diagonal/></border>'
+    '</borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="5">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="0" fillId="2" borderId="0" xfId="0" applyFill="1"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="164" fontId="0" fillId="2" borderId="0" xfId="0" applyNumberFormat="1" applyFill="1"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="1" xfId="0" applyFont="1" applyBorder="1" applyAlignment="1">'
+    '<alignment horizontal="center" vertical="top"/></xf>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetData>'
+)
+
+_SHEET_END = '</sheetData></worksheet>'
+
+
+def write_highlighted(df: pd.DataFrame, out, highlight_mask: np.ndarray, sheet_name: str = 'Results'):
+    """
+    Write df to a single-sheet XLSX file, filling highlighted rows light red.
+
+    The package XML is written directly, streaming the sheet in chunks,
+    so there is no per-cell object overhead as with openpyxl/xlsxwriter.
+    Strings are written inline (never as formulas), infinities as the text
+    'inf'/'-inf' and missing values as blank cells.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        The data to write; the header row is df's column names
+    out : str or file-like
+        Path or writable binary stream for the .xlsx file
+    highlight_mask : np.ndarray
+        bool, one entry per row of df; True rows are filled
+    sheet_name : str
+        Name of the worksheet
+    """
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as package:
+        package.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        package.writestr('_rels/.rels', _ROOT_RELS)
+        package.writestr('xl/workbook.xml', _WORKBOOK.format(sheet_name=escape(sheet_name, {'"': '&quot;'})))
+        package.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        package.writestr('xl/styles.xml', _STYLES)
+
+        with package.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(_SHEET_START.encode('utf-8'))
+            for chunk_xml in _sheet_rows(df, highlight_mask):
+                sheet.write(chunk_xml.encode('utf-8'))
+            sheet.write(_SHEET_END.encode('utf-8'))
+
+
+def _sheet_rows(df: pd.DataFrame, highlight_mask: np.ndarray):
+    """Yield the <row> elements of the sheet, one string per chunk."""
+    col_letters = [_column_letter(col_idx) for col_idx in range(len(df.columns))]
+    date_cols = [pd.api.types.is_datetime64_any_dtype(df[col]) for col in df.columns]
+
+    # Header row
+    yield _header_xml(col_letters, [str(col) for col in df.columns])
+
+    highlight_mask = np.asarray(highlight_mask, dtype=bool)
+    for start in range(0, len(df), CHUNK_ROWS):
+        chunk = df.iloc[start:start + CHUNK_ROWS]
+
+        # Dates become Excel serial numbers; missing values become None
+        columns = []
+        for is_date, col in zip(date_cols, chunk.columns):
+            values = chunk[col]
+            if is_date:
+                values = (values - EXCEL_EPOCH) / pd.Timedelta(days=1)
+            values = values.astype(object)
+            columns.append(values.where(values.notna(), None).tolist())
+
+        highlights = highlight_mask[start:start + CHUNK_ROWS].tolist()
+        yield ''.join(
+            _row_xml(start + offset + 2, col_letters, row, date_cols, highlighted)
+            for offset, (highlighted, row) in enumerate(zip(highlights, zip(*columns)))
+        )
+
+
+def _header_xml(col_letters: list, names: list) -> str:
+    """Build the header <row> element, bold with a thin border."""
+    cells = ''.join(
+        f'<c r="{letter}1" s="{STYLE_HEADER}" t="inlineStr"><is><t xml:space="preserve">'
+        f'{escape(_ILLEGAL_XML_CHARS.sub("", name))}</t></is></c>'
+        for letter, name in zip(col_letters, names)
+    )
+    return f'<row r="1">{cells}</row>'
+
+
+def _row_xml(row_num: int, col_letters: list, values, date_cols: list, highlighted: bool) -> str:
+    """Build the <row> element for one row of values."""
+    cells = []
+    for letter, value, is_date in zip(col_letters, values, date_cols):
+        if is_date:
+            style = STYLE_HIGHLIGHT_DATE if highlighted else STYLE_DATE
+        else:
+            style = STYLE_HIGHLIGHT if highlighted else STYLE_NORMAL
+        style_attr = f' s="{style}"' if style else ''
+        ref = f'{letter}{row_num}'
+
+        if value is None:
+            # Blank cells only need writing when they carry a fill
+            if highlighted:
+                cells.append(f'<c r="{ref}"{style_attr}/>')
+        elif isinstance(value, bool):
+            cells.append(f'<c r="{ref}"{style_attr} t="b"><v>{int(value)}</v></c>')
+        elif isinstance(value, numbers.Integral):
+            cells.append(f'<c r="{ref}"{style_attr}><v>{int(value)}</v></c>')
+        elif isinstance(value, numbers.Real) and math.isfinite(value):
+            cells.append(f'<c r="{ref}"{style_attr}><v>{float(value)!r}</v></c>')
+        else:
+            text = escape(_ILLEGAL_XML_CHARS.sub('', str(value)))
+            cells.append(f'<c r="{ref}"{style_attr} t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+
+    return f'<row r="{row_num}">{"".join(cells)}</row>'
+
+
+def _column_letter(col_idx: int) -> str:
+    """Convert a 0-based column index to its Excel letter (0 -> A, 26 -> AA)."""
+    letters = ''
+    col_idx += 1
+    while col_idx:
+        col_idx, remainder = divmod(col_idx - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
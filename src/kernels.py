@@ -0,0 +1,53 @@
+"""Numeric kernels for the anomaly bounds check."""
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+# Below this many rows the JIT kernel's thread start-up outweighs its gain
+# over plain NumPy
+NUMBA_MIN_ROWS = 1_000_000
+
+
+if HAS_NUMBA:
+    # fastmath is deliberately off: it lets LLVM assume no NaNs, but NaN is
+    # how missing bounds and non-numeric responses are represented
+    @njit(parallel=True, cache=True)
+    def _outlier_codes_numba(response, lower, upper, has_criteria, out):
+        for i in prange(response.shape[0]):
+            if has_criteria[i] and (response[i] < lower[i] or response[i] > upper[i]):
+                out[i] = 1
+            else:
+                out[i] = 0
+
+
+def outlier_codes(response: np.ndarray, lower: np.ndarray, upper: np.ndarray, has_criteria: np.ndarray) -> np.ndarray:
+    """
+    Flag values outside their bounds.
+
+    Parameters:
+    -----------
+    response : np.ndarray
+        float64 measured values (NaN for non-numeric)
+    lower, upper : np.ndarray
+        float64 bounds per row (NaN where no criteria apply)
+    has_criteria : np.ndarray
+        bool, True for rows whose RESULT_NAME has criteria
+
+    Returns:
+    --------
+    np.ndarray
+        int8 codes: 1 for ABNORMAL, 0 for NORMAL. Comparisons against NaN
+        are False, so rows with a NaN response or bound stay NORMAL.
+    """
+    if HAS_NUMBA and len(response) >= NUMBA_MIN_ROWS:
+        out = np.empty(len(response), dtype=np.int8)
+        _outlier_codes_numba(response, lower, upper, has_criteria, out)
+        return out
+
+    mask = has_criteria & ((response < lower) | (response > upper))
+    return mask.astype(np.int8)
@@ -2,8 +2,9 @@
 
 import streamlit as st
 import pandas as pd
+from src.data_loader import DataLoader
 from src.detector import AnomalyDetector
-from src.export import create_formatted_excel
+from src.export import create_formatted_excel, create_plain_excel, create_parquet
 
 
 def display_results(result_df: pd.DataFrame):
@@ -30,24 +31,25 @@ def display_results(result_df: pd.DataFrame):
     with col3:
         st.metric("Abnormal", stats['abnormal_count'])
 
-    # Check if there are anomalies
-    abnormal_df = result_df[result_df['IS_OUTLIER'] == 'ABNORMAL'].copy()
-
-    if not abnormal_df.empty:
+    if stats['abnormal_count'] > 0:
         # Detailed results table - only show rows with anomalies
         st.markdown("### Detailed Anomaly Records")
 
-        # Select relevant columns for display
+        # Select abnormal rows and display columns in one read-only .loc
         display_cols = ['ITEM_NUMBER', 'TEST_NUMBER', 'RESULT_NAME', 'RESPONSE', 'Lower_Bound', 'Upper_Bound', 'IS_OUTLIER']
-        display_df = abnormal_df[display_cols]
+        abnormal_mask = AnomalyDetector.get_outlier_codes(result_df) == 1
+        display_df = result_df.loc[abnormal_mask, display_cols]
 
         st.dataframe(display_df, width='stretch', hide_index=True)
 
         # Download button for full results
         st.markdown("### Export Results")
 
+        # Exports are cached per analysis run
+        run_id = st.session_state.run_id
+
         # Create formatted Excel file
-        excel_file = create_formatted_excel(result_df)
+        excel_file = create_formatted_excel(result_df, (run_id, 'all'))
 
         st.download_button(
             label="Download Results (Excel with highlighting)",
@@ -56,6 +58,30 @@ def display_results(result_df: pd.DataFrame):
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             width='content'
         )
+
+        # Abnormal rows only, without highlighting. Built on request, so
+        # runs that don't need it don't pay for a second file.
+        if st.session_state.abnormal_export_run_id != run_id:
+            if st.button("Prepare Abnormal Rows Download (Excel)"):
+                st.session_state.abnormal_export_run_id = run_id
+                st.rerun()
+        else:
+            st.download_button(
+                label="Download Abnormal Rows Only (Excel)",
+                data=create_plain_excel(display_df, (run_id, 'abnormal')),
+                file_name="anomaly_detection_abnormal_rows.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                width='content'
+            )
+
+        # Parquet is much quicker to build for large runs and keeps dtypes
+        st.download_button(
+            label="Download Results (Parquet, fast)",
+            data=create_parquet(result_df, (run_id, 'all')),
+            file_name="anomaly_detection_results.parquet",
+            mime="application/octet-stream",
+            width='content'
+        )
     else:
         st.success("No anomalies detected! All measurements are within acceptable ranges.")
 
@@ -86,106 +112,121 @@ def display_file_stats(stats: dict, filename: str):
         st.metric("Tests", stats['total_tests'])
 
 
-def display_filter_row(i: int, filter_item: dict, result_names: list, df: pd.DataFrame, selected_items: list, remove_callback):
+@st.cache_data(show_spinner=False, max_entries=1000, ttl=3600)
+def _filter_stats(_df: pd.DataFrame, _lookup: pd.Series, file_id: str, items: tuple, result_name: str) -> tuple:
+    """
+    Get the RESPONSE range and quartiles for a filter row.
+
+    Streamlit reruns the script on every widget change, so this is cached.
+    The leading underscores keep _df and _lookup out of the cache key;
+    file_id, set once per upload, identifies the data instead. The cache
+    is shared by all sessions, so it is bounded; entries are four floats.
+
+    Parameters:
+    -----------
+    _df : pd.DataFrame
+        The data dataframe
+    _lookup : pd.Series
+        Row lookup for _df from DataLoader.build_row_lookup()
+    file_id : str
+        ID of the upload the dataframe was loaded from
+    items : tuple
+        Selected ITEM_NUMBERs
+    result_name : str
+        The RESULT_NAME to summarize
+
+    Returns:
+    --------
+    Tuple
+        (overall_min, overall_max, q1, q3), see
+        DataLoader.get_response_summary()
+    """
+    return DataLoader.get_response_summary(_df, list(items), result_name, lookup=_lookup)
+
+
+def display_filter_row(filter_item: dict, result_names: list, result_name_index: dict, df: pd.DataFrame, selected_items: list, remove_callback):
     """
     Display a single filter row with test type selector and bounds.
 
+    The row is rendered inside the filter form, so widget values arrive
+    together when the form is submitted. filter_item is updated in place.
+
     Parameters:
     -----------
-    i : int
-        Filter index
     filter_item : dict
-        Filter configuration with result_name, lower_bound, upper_bound
+        Filter configuration with id, result_name, lower_bound, upper_bound
     result_names : list
         Available result names to choose from
+    result_name_index : dict
+        Maps each result name to its position in result_names
     df : pd.DataFrame
         The data dataframe
     selected_items : list
         Selected product items
     remove_callback : function
-        Function to call when remove button is clicked
+        Function to call with the filter id when remove button is clicked
     """
-    from src.data_loader import DataLoader
+    # Widget keys use the filter's stable id, not its list position
+    filter_id = filter_item['id']
+    lower_key = f"lower_{filter_id}"
+    upper_key = f"upper_{filter_id}"
 
     col1, col2, col3, col4 = st.columns([3, 1.5, 1.5, 0.5])
 
     with col1:
-        # Store previous selection to detect changes
-        prev_result_name = filter_item.get('result_name')
-
         selected_result = st.selectbox(
             "Test Type",
             options=result_names,
-            key=f"result_name_{i}",
-            index=result_names.index(filter_item['result_name']) if filter_item['result_name'] in result_names else 0
+            key=f"result_name_{filter_id}",
+            index=result_name_index.get(filter_item['result_name'], 0)
         )
 
-        # If result name changed, recalculate IQR bounds and force rerun
-        if selected_result != prev_result_name:
-            st.session_state.filters[i]['result_name'] = selected_result
-
-            # Calculate IQR bounds for the new result name
-            iqr_lower, iqr_upper = DataLoader.calculate_iqr_bounds(df, selected_items, selected_result)
-            if iqr_lower is not None and iqr_upper is not None:
-                st.session_state.filters[i]['lower_bound'] = iqr_lower
-                st.session_state.filters[i]['upper_bound'] = iqr_upper
-
-            # Force rerun to update input boxes
-            st.rerun()
-
-        # Update result name in session state
-        st.session_state.filters[i]['result_name'] = selected_result
+        # Data range and quartile bounds for this selection (cached per upload)
+        overall_min, overall_max, q1, q3 = _filter_stats(
+            df, st.session_state.row_lookup, st.session_state.file_id, tuple(selected_items), selected_result
+        )
 
-        # If bounds are still default (0.0), calculate IQR bounds
+        # If result name changed, reset bounds to the quartiles unless they
+        # were edited in the same submission. The bound widgets haven't been
+        # created yet in this run, so their values can still be set here.
+        if selected_result != filter_item['result_name']:
+            bounds_edited = (
+                st.session_state.get(lower_key, filter_item['lower_bound']) != filter_item['lower_bound']
+                or st.session_state.get(upper_key, filter_item['upper_bound']) != filter_item['upper_bound']
+            )
+            filter_item['result_name'] = selected_result
+
+            if q1 is not None and q3 is not None and not bounds_edited:
+                filter_item['lower_bound'] = st.session_state[lower_key] = q1
+                filter_item['upper_bound'] = st.session_state[upper_key] = q3
+
+        # If bounds are still default (0.0), use the quartile bounds
         if filter_item['lower_bound'] == 0.0 and filter_item['upper_bound'] == 0.0:
-            iqr_lower, iqr_upper = DataLoader.calculate_iqr_bounds(df, selected_items, selected_result)
-            if iqr_lower is not None and iqr_upper is not None:
-                st.session_state.filters[i]['lower_bound'] = iqr_lower
-                st.session_state.filters[i]['upper_bound'] = iqr_upper
-
-        # Show actual data range and IQR bounds
-        all_min_vals = []
-        all_max_vals = []
-        for item in selected_items:
-            min_val, max_val = DataLoader.get_value_range(df, item, selected_result)
-            if min_val is not None:
-                all_min_vals.append(min_val)
-            if max_val is not None:
-                all_max_vals.append(max_val)
-
-        if all_min_vals and all_max_vals:
-            overall_min = min(all_min_vals)
-            overall_max = max(all_max_vals)
-
-            # Get quartile bounds for display
-            q1, q3 = DataLoader.calculate_iqr_bounds(df, selected_items, selected_result)
+            if q1 is not None and q3 is not None:
+                filter_item['lower_bound'] = st.session_state[lower_key] = q1
+                filter_item['upper_bound'] = st.session_state[upper_key] = q3
+
+        # Show actual data range and quartile bounds
+        if overall_min is not None and overall_max is not None:
             if q1 is not None and q3 is not None:
                 st.caption(f"Data range: {overall_min:.3f} to {overall_max:.3f} | Quartile bounds (Q1-Q3): {q1:.3f} to {q3:.3f}")
             else:
                 st.caption(f"Data range: {overall_min:.3f} to {overall_max:.3f}")
 
+    # Widget values live in session state under their keys; seed them from
+    # the filter the first time the row is shown
+    st.session_state.setdefault(lower_key, filter_item['lower_bound'])
+    st.session_state.setdefault(upper_key, filter_item['upper_bound'])
+
     with col2:
-        # Use session state value directly to ensure it updates
-        lower = st.number_input(
-            "Lower",
-            value=st.session_state.filters[i]['lower_bound'],
-            format="%.3f",
-            key=f"lower_{i}_{selected_result}"  # Include result_name in key to force refresh
-        )
-        st.session_state.filters[i]['lower_bound'] = lower
+        filter_item['lower_bound'] = st.number_input("Lower", format="%.3f", key=lower_key)
 
     with col3:
-        # Use session state value directly to ensure it updates
-        upper = st.number_input(
-            "Upper",
-            value=st.session_state.filters[i]['upper_bound'],
-            format="%.3f",
-            key=f"upper_{i}_{selected_result}"  # Include result_name in key to force refresh
-        )
-        st.session_state.filters[i]['upper_bound'] = upper
+        filter_item['upper_bound'] = st.number_input("Upper", format="%.3f", key=upper_key)
 
     with col4:
         st.markdown("<br>", unsafe_allow_html=True)
-        if st.button("✕", key=f"remove_{i}", help="Remove"):
-            remove_callback(i)
+        # Regular buttons aren't allowed inside the filter form
+        if st.form_submit_button("✕", key=f"remove_{filter_id}", help="Remove"):
+            remove_callback(filter_id)
             st.rerun()
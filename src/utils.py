@@ -5,32 +5,60 @@ import streamlit as st
 
 def add_filter():
     """Add a new empty filter to the session state."""
+    # Stable id for the filter's widget keys, so removing a filter doesn't
+    # shift the widgets of the filters after it
+    filter_id = st.session_state.next_filter_id
+    st.session_state.next_filter_id += 1
+
     st.session_state.filters.append({
+        'id': filter_id,
         'result_name': None,
         'lower_bound': 0.0,
         'upper_bound': 0.0
     })
 
 
-def remove_filter(index: int):
+def remove_filter(filter_id: int):
     """
-    Remove a filter at the specified index.
+    Remove the filter with the specified id.
 
     Parameters:
     -----------
-    index : int
-        Index of the filter to remove
+    filter_id : int
+        The 'id' of the filter to remove
     """
-    st.session_state.filters.pop(index)
+    st.session_state.filters = [
+        f for f in st.session_state.filters if f['id'] != filter_id
+    ]
+
+    # Drop the removed filter's widget values
+    for key in (f"result_name_{filter_id}", f"lower_{filter_id}", f"upper_{filter_id}"):
+        st.session_state.pop(key, None)
 
 
 def initialize_session_state():
     """Initialize all session state variables."""
     if 'df' not in st.session_state:
         st.session_state.df = None
+    if 'file_id' not in st.session_state:
+        st.session_state.file_id = None
+    if 'item_numbers' not in st.session_state:
+        st.session_state.item_numbers = None
+    if 'result_names_by_item' not in st.session_state:
+        st.session_state.result_names_by_item = None
+    if 'test_counts' not in st.session_state:
+        st.session_state.test_counts = None
+    if 'row_lookup' not in st.session_state:
+        st.session_state.row_lookup = None
     if 'selected_item' not in st.session_state:
         st.session_state.selected_item = None
     if 'filters' not in st.session_state:
         st.session_state.filters = []
+    if 'next_filter_id' not in st.session_state:
+        st.session_state.next_filter_id = 0
     if 'analysis_results' not in st.session_state:
         st.session_state.analysis_results = None
+    if 'run_id' not in st.session_state:
+        st.session_state.run_id = None
+    if 'abnormal_export_run_id' not in st.session_state:
+        st.session_state.abnormal_export_run_id = None
@@ -0,0 +1,111 @@
+"""Round-trip checks for src.fast_xlsx: write a sheet, read it back with openpyxl."""
+
+import unittest
+from datetime import datetime
+from io import BytesIO
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from src import fast_xlsx
+
+RED = 'FFFFCCCC'
+DATE_FORMAT = 'yyyy-mm-dd hh:mm:ss'
+
+
+def _round_trip(df: pd.DataFrame, highlight_mask) -> list:
+    """Write df with fast_xlsx and return the rows of the loaded sheet."""
+    output = BytesIO()
+    fast_xlsx.write_highlighted(df, output, np.asarray(highlight_mask))
+    output.seek(0)
+    worksheet = load_workbook(output)['Results']
+    return list(worksheet.iter_rows(min_col=1, max_col=len(df.columns), max_row=len(df) + 1))
+
+
+class TestWriteHighlighted(unittest.TestCase):
+    """write_highlighted() output as read by openpyxl."""
+
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'ITEM_NUMBER': pd.Categorical(['A1', 'B2', 'A1', 'C3']),
+            'TEST_NUMBER': np.array([1, 2, 3, 4], dtype='int64'),
+            'RESPONSE': [1.5, 'a<b&"c"', '=SUM(A1:A2)', 'bell\x07'],
+            'VALUE': [np.nan, np.inf, -np.inf, 2.25],
+            'PASSED': [True, False, True, False],
+            'TESTED_AT': pd.to_datetime(['2024-01-02 03:04:05', None, '2024-03-04 00:00:00', '2024-05-06 07:08:09']),
+        })
+        self.mask = [True, False, False, True]
+
+    def test_values(self):
+        rows = _round_trip(self.df, self.mask)
+
+        self.assertEqual([cell.value for cell in rows[0]], list(self.df.columns))
+        self.assertEqual(
+            [[cell.value for cell in row] for row in rows[1:]],
+            [
+                ['A1', 1, 1.5, None, True, datetime(2024, 1, 2, 3, 4, 5)],
+                ['B2', 2, 'a<b&"c"', 'inf', False, None],
+                ['A1', 3, '=SUM(A1:A2)', '-inf', True, datetime(2024, 3, 4)],
+                ['C3', 4, 'bell', 2.25, False, datetime(2024, 5, 6, 7, 8, 9)],
+            ]
+        )
+        # Text that looks like a formula stays text
+        self.assertEqual(rows[3][2].data_type, 's')
+
+    def test_highlight_fill(self):
+        rows = _round_trip(self.df, self.mask)
+
+        for row, highlighted in zip(rows[1:], self.mask):
+            for cell in row:
+                if highlighted:
+                    self.assertEqual(cell.fill.fill_type, 'solid')
+                    self.assertEqual(cell.fill.fgColor.rgb, RED)
+                else:
+                    self.assertIsNone(cell.fill.fill_type)
+
+    def test_date_format(self):
+        rows = _round_trip(self.df, self.mask)
+
+        for row in rows[1:]:
+            cell = row[-1]
+            if cell.value is not None:
+                self.assertTrue(cell.is_date)
+                self.assertEqual(cell.number_format, DATE_FORMAT)
+
+    def test_header_style(self):
+        rows = _round_trip(self.df, self.mask)
+
+        for cell in rows[0]:
+            self.assertTrue(cell.font.b)
+            self.assertEqual(cell.border.left.style, 'thin')
+            self.assertEqual(cell.border.bottom.style, 'thin')
+            self.assertEqual(cell.alignment.horizontal, 'center')
+            self.assertIsNone(cell.fill.fill_type)
+
+    def test_chunks_keep_row_order(self):
+        # Several chunks: row numbers and highlights must line up across them
+        with mock.patch.object(fast_xlsx, 'CHUNK_ROWS', 3):
+            df = pd.DataFrame({'N': range(10)})
+            mask = [n % 4 == 0 for n in range(10)]
+            rows = _round_trip(df, mask)
+
+        self.assertEqual([row[0].value for row in rows[1:]], list(range(10)))
+        self.assertEqual([row[0].fill.fill_type == 'solid' for row in rows[1:]], mask)
+
+    def test_empty_frame(self):
+        rows = _round_trip(self.df.iloc[:0], [])
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual([cell.value for cell in rows[0]], list(self.df.columns))
+
+    def test_column_letters(self):
+        self.assertEqual(
+            [fast_xlsx._column_letter(idx) for idx in (0, 25, 26, 51, 52, 701, 702)],
+            ['A', 'Z', 'AA', 'AZ', 'BA', 'ZZ', 'AAA']
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()